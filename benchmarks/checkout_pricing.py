@@ -0,0 +1,81 @@
+"""
+Checkout Pricing Benchmark
+
+Latency of server-side cart pricing as the cart grows, against a stand-in
+collection that charges a fixed network round trip per query (no Mongo
+needed). `pricing.price_items` resolves the whole cart with one `$in` query;
+the naive variant looks each line item up with its own find_one.
+
+    python benchmarks/checkout_pricing.py
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+
+from pricing import price_items, unit_price
+
+ROUND_TRIP = 0.001  # seconds per query, a same-region Mongo
+CART_SIZES = [1, 10, 25, 50, 100]
+ROUNDS = 5
+
+class _Cursor:
+    def __init__(self, docs):
+        self._docs = iter(docs)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not hasattr(self, "_waited"):
+            self._waited = True
+            await asyncio.sleep(ROUND_TRIP)
+        try:
+            return next(self._docs)
+        except StopIteration:
+            raise StopAsyncIteration
+
+class FakeProducts:
+    def __init__(self, docs):
+        self.docs = {d["_id"]: d for d in docs}
+
+    def find(self, filter_dict, projection=None):
+        return _Cursor([self.docs[i] for i in filter_dict["_id"]["$in"] if i in self.docs])
+
+    async def find_one(self, filter_dict, projection=None):
+        await asyncio.sleep(ROUND_TRIP)
+        return self.docs.get(filter_dict["_id"])
+
+async def naive_price_items(db, items):
+    priced, subtotal = [], 0.0
+    for item in items:
+        product = await db["product"].find_one({"_id": ObjectId(item["product_id"])})
+        price = unit_price(product, item["license"])
+        priced.append({**item, "price": price})
+        subtotal += price * item["quantity"]
+    return priced, round(subtotal, 2)
+
+async def timed(fn, db, items):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        await fn(db, items)
+    return (time.perf_counter() - start) / ROUNDS * 1000
+
+async def main():
+    products = [{"_id": ObjectId(), "title": f"Design {i}", "price": 10.0 + i, "in_stock": True} for i in range(max(CART_SIZES))]
+    print(f"round trip {ROUND_TRIP * 1000:.1f} ms, {ROUNDS} rounds")
+    print(f"{'items':>5} {'batched ms':>11} {'naive ms':>9}")
+    for size in CART_SIZES:
+        items = [{"product_id": str(p["_id"]), "title": p["title"], "price": p["price"], "license": "personal", "quantity": 1} for p in products[:size]]
+        db = {"product": FakeProducts(products)}
+        batched = await timed(price_items, db, items)
+        naive = await timed(naive_price_items, db, items)
+        print(f"{size:>5} {batched:>11.2f} {naive:>9.2f}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
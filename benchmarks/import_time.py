@@ -0,0 +1,52 @@
+"""
+Import-Time Budget
+
+Measures how long `import main` takes in a fresh interpreter using
+`python -X importtime`, prints the slowest modules and exits non-zero when the
+median cumulative time is over budget, so it can gate CI:
+
+    python benchmarks/import_time.py            # budget from IMPORT_TIME_BUDGET_MS (default 1000)
+    python benchmarks/import_time.py --budget 600
+
+Importing main must not open any Mongo connection; clients are created lazily
+and warmed in the lifespan hook instead.
+"""
+
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUNS = 5
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+def measure():
+    """One fresh import; returns (cumulative us for main, {module: self us})"""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    total = 0
+    self_times = {}
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, _, module = match.groups()
+        self_times[module] = int(self_us)
+        if module == "main":
+            total = int(cumulative_us)
+    return total, self_times
+
+if __name__ == "__main__":
+    budget_ms = float(os.getenv("IMPORT_TIME_BUDGET_MS", "1000"))
+    if "--budget" in sys.argv:
+        budget_ms = float(sys.argv[sys.argv.index("--budget") + 1])
+
+    runs = [measure() for _ in range(RUNS)]
+    median_ms = statistics.median(total for total, _ in runs) / 1000
+    print(f"import main: median {median_ms:.0f} ms over {RUNS} runs (budget {budget_ms:.0f} ms)")
+    print("slowest modules (self time, last run):")
+    for module, self_us in sorted(runs[-1][1].items(), key=lambda kv: -kv[1])[:10]:
+        print(f"  {self_us / 1000:7.1f} ms  {module}")
+    sys.exit(0 if median_ms <= budget_ms else 1)
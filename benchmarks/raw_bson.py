@@ -0,0 +1,106 @@
+"""
+RawBSON Pass-Through Benchmark
+
+Evaluates serving listings by converting raw BSON bytes straight to JSON
+(`_id` -> `id` and datetime formatting done in the converter) instead of
+decoding to dicts and encoding with orjson.
+
+- decoded: `bson.decode` (C extension) + `serialize_doc` + `APIResponse`,
+  i.e. what list_products/list_projects do today
+- raw: `bson_to_json` below, a pure-Python BSON -> JSON walker over the
+  bytes a RawBSONDocument cursor returns
+
+The walker has to touch every element from Python, so it comes out several
+times slower than C decoding plus orjson, which is why the read endpoints
+don't use a RawBSON path. Keep this around to re-check if a native converter shows up.
+
+    python benchmarks/raw_bson.py
+"""
+
+import os
+import struct
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bson
+import orjson
+
+from benchmarks.serialization import N_DOCS, ROUNDS, make_products
+from main import serialize_doc
+from responses import dumps
+
+_int32 = struct.Struct("<i").unpack_from
+_int64 = struct.Struct("<q").unpack_from
+_double = struct.Struct("<d").unpack_from
+_EPOCH = datetime(1970, 1, 1)
+
+def _elements(buf: bytes, pos: int, end: int, out: list, is_array: bool, top: bool):
+    first = True
+    while pos < end - 1:
+        kind = buf[pos]
+        name_end = buf.index(b"\x00", pos + 1)
+        name = buf[pos + 1:name_end]
+        pos = name_end + 1
+        if not first:
+            out.append(b",")
+        first = False
+        if not is_array:
+            out.append(b'"id":' if top and name == b"_id" else orjson.dumps(name.decode()) + b":")
+        if kind == 0x02:  # string
+            size = _int32(buf, pos)[0]
+            out.append(orjson.dumps(buf[pos + 4:pos + 3 + size].decode()))
+            pos += 4 + size
+        elif kind == 0x01:  # double
+            out.append(orjson.dumps(_double(buf, pos)[0]))
+            pos += 8
+        elif kind == 0x07:  # ObjectId
+            out.append(b'"' + buf[pos:pos + 12].hex().encode() + b'"')
+            pos += 12
+        elif kind == 0x08:  # bool
+            out.append(b"true" if buf[pos] else b"false")
+            pos += 1
+        elif kind == 0x0A:  # null
+            out.append(b"null")
+        elif kind == 0x09:  # UTC datetime, ms since epoch
+            out.append(orjson.dumps(_EPOCH + timedelta(milliseconds=_int64(buf, pos)[0])))
+            pos += 8
+        elif kind in (0x03, 0x04):  # embedded document / array
+            size = _int32(buf, pos)[0]
+            out.append(b"[" if kind == 0x04 else b"{")
+            _elements(buf, pos + 4, pos + size, out, kind == 0x04, False)
+            out.append(b"]" if kind == 0x04 else b"}")
+            pos += size
+        elif kind == 0x10:  # int32
+            out.append(str(_int32(buf, pos)[0]).encode())
+            pos += 4
+        elif kind == 0x12:  # int64
+            out.append(str(_int64(buf, pos)[0]).encode())
+            pos += 8
+        else:
+            raise ValueError(f"unsupported BSON type 0x{kind:02x}")
+
+def bson_to_json(raw_docs) -> bytes:
+    out = [b"["]
+    for i, raw in enumerate(raw_docs):
+        if i:
+            out.append(b",")
+        out.append(b"{")
+        _elements(raw, 4, len(raw), out, False, True)
+        out.append(b"}")
+    out.append(b"]")
+    return b"".join(out)
+
+def decoded(raw_docs) -> bytes:
+    return dumps([serialize_doc(bson.decode(raw)) for raw in raw_docs])
+
+if __name__ == "__main__":
+    raw_docs = [bson.encode(d) for d in make_products(N_DOCS)]
+    assert sorted(orjson.loads(bson_to_json(raw_docs))[0].items()) == sorted(orjson.loads(decoded(raw_docs))[0].items())
+    d = timeit.timeit(lambda: decoded(raw_docs), number=ROUNDS) / ROUNDS / N_DOCS * 1e6
+    r = timeit.timeit(lambda: bson_to_json(raw_docs), number=ROUNDS) / ROUNDS / N_DOCS * 1e6
+    print(f"{N_DOCS} products x {ROUNDS} rounds")
+    print(f"decoded: {d:8.2f} us/doc")
+    print(f"raw:     {r:8.2f} us/doc  ({r / d:.1f}x the decoded cost)")
@@ -0,0 +1,110 @@
+"""
+Serialization Benchmark
+
+Per-document cost of turning a 1k-product listing, and a set of deep project
+documents (hundreds of comments and drafts each), into a JSON body:
+
+- before: the old `serialize_doc` (top-level datetime loop) followed by
+  FastAPI's `jsonable_encoder` and Starlette's stdlib `json` rendering; nested
+  datetimes were left to `jsonable_encoder`
+- after: the rename-only `serialize_doc` followed by `APIResponse` (orjson)
+
+Run from the repository root:
+
+    python benchmarks/serialization.py
+"""
+
+import copy
+import os
+import sys
+import timeit
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import Decimal128, ObjectId
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import JSONResponse
+
+from main import serialize_doc
+from responses import APIResponse
+
+N_DOCS = 1000
+N_PROJECTS = 20
+N_COMMENTS = 300
+ROUNDS = 20
+
+def make_products(n):
+    now = datetime.now(timezone.utc)
+    return [{
+        "_id": ObjectId(),
+        "title": f"Design {i}",
+        "description": "Hand-drawn botanical line art, print ready",
+        "price": 12.5 + i % 40,
+        "category": "illustration",
+        "style": "minimal",
+        "color": "green",
+        "file_types": ["svg", "png", "pdf"],
+        "images": [f"/img/{i}-1.jpg", f"/img/{i}-2.jpg"],
+        "featured": i % 10 == 0,
+        "rating": 4.8,
+        "in_stock": True,
+        "created_at": now,
+        "updated_at": now,
+    } for i in range(n)]
+
+def make_projects(n, n_comments):
+    now = datetime.now(timezone.utc)
+    return [{
+        "_id": ObjectId(),
+        "title": f"Brand kit {i}",
+        "client_email": f"client{i}@example.com",
+        "request_id": str(ObjectId()),
+        "status": "in_progress",
+        "budget": Decimal128("1250.00"),
+        "drafts": [{"url": f"/drafts/{i}-{j}.png", "uploaded_at": now} for j in range(n_comments // 10)],
+        "comments": [{
+            "author": "reviewer",
+            "message": "Can we try the logo a touch larger here?",
+            "x": 0.42,
+            "y": 0.17,
+            "created_at": now,
+            "status": "open",
+        } for _ in range(n_comments)],
+        "history": [],
+        "created_at": now,
+        "updated_at": now,
+    } for i in range(n)]
+
+def legacy_serialize_doc(doc):
+    doc["id"] = str(doc.get("_id"))
+    doc.pop("_id", None)
+    for k, v in list(doc.items()):
+        if isinstance(v, datetime):
+            doc[k] = v.isoformat()
+    return doc
+
+def before(docs):
+    content = jsonable_encoder([legacy_serialize_doc(d) for d in docs], custom_encoder={Decimal128: str})
+    return JSONResponse(content).body
+
+def after(docs):
+    return APIResponse([serialize_doc(d) for d in docs]).body
+
+def bench(fn, source):
+    # serializers mutate, so each round gets a fresh copy (copy cost excluded)
+    batches = [copy.deepcopy(source) for _ in range(ROUNDS)]
+    it = iter(batches)
+    total = timeit.timeit(lambda: fn(next(it)), number=ROUNDS)
+    return total / ROUNDS / len(source) * 1e6
+
+def report(label, source):
+    b = bench(before, source)
+    a = bench(after, source)
+    print(label)
+    print(f"  before: {b:9.2f} us/doc")
+    print(f"  after:  {a:9.2f} us/doc  ({b / a:.1f}x faster)")
+
+if __name__ == "__main__":
+    report(f"{N_DOCS} products x {ROUNDS} rounds", make_products(N_DOCS))
+    report(f"{N_PROJECTS} projects with {N_COMMENTS} comments x {ROUNDS} rounds", make_projects(N_PROJECTS, N_COMMENTS))
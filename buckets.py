@@ -0,0 +1,165 @@
+"""
+Project Comment/Draft Buckets
+
+Comments and drafts live in fixed-size bucket documents in `project_bucket`,
+one series per (project, kind), instead of growing arrays on the project.
+The project document only keeps a running count and the latest
+PROJECT_LATEST_ITEMS entries, so it stays small no matter how busy the
+proofing session gets.
+
+Every item gets a 1-based `seq` from the project's counter; item `seq` lives
+in bucket `(seq - 1) // BUCKET_SIZE`, so pages are found without scanning.
+
+Projects created before bucketing still carry their full arrays. The first
+append to such a project moves them over; to migrate all of them up front:
+
+    python buckets.py --migrate
+"""
+
+import asyncio
+import os
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+import settings  # noqa: F401  (.env before the reads below)
+
+BUCKET_COLLECTION = "project_bucket"
+BUCKET_SIZE = int(os.getenv("PROJECT_BUCKET_SIZE", "100"))
+PROJECT_LATEST_ITEMS = int(os.getenv("PROJECT_LATEST_ITEMS", "10"))
+
+# kind -> (array on the project, counter on the project)
+KINDS = {
+    "comment": ("comments", "comment_count"),
+    "draft": ("drafts", "draft_count"),
+}
+
+# Open comments so far; projects that predate the counter fall back to their embedded array
+OPEN_COMMENTS = {"$ifNull": ["$open_comment_count", {"$size": {"$filter": {
+    "input": {"$ifNull": ["$comments", []]},
+    "cond": {"$eq": ["$$this.status", "open"]},
+}}}]}
+
+# Fixed-size row for project listings, whatever the project's activity
+SUMMARY_PROJECTION = {
+    "title": 1,
+    "client_email": 1,
+    "status": 1,
+    "request_id": 1,
+    "created_at": 1,
+    "approved_at": 1,
+    "draft_count": {"$ifNull": ["$draft_count", {"$size": {"$ifNull": ["$drafts", []]}}]},
+    "comment_count": {"$ifNull": ["$comment_count", {"$size": {"$ifNull": ["$comments", []]}}]},
+    "open_comment_count": OPEN_COMMENTS,
+    "latest_draft_url": {"$arrayElemAt": ["$drafts.url", -1]},
+    "last_activity": "$updated_at",
+}
+
+def _bucket_of(seq: int) -> int:
+    return (seq - 1) // BUCKET_SIZE
+
+async def _copy_to_buckets(db, project_id: ObjectId, kind: str, items: List[Dict[str, Any]]):
+    """Push seq-numbered items into their buckets; safe to repeat"""
+    for start in range(0, len(items), BUCKET_SIZE):
+        chunk = items[start:start + BUCKET_SIZE]
+        # a chunk is pushed atomically, so if its first seq is there the whole chunk is
+        query = {"project_id": project_id, "kind": kind, "bucket": _bucket_of(chunk[0]["seq"]), "items.seq": {"$ne": chunk[0]["seq"]}}
+        push = {"$push": {"items": {"$each": chunk}}}
+        try:
+            await db[BUCKET_COLLECTION].update_one(query, push, upsert=True)
+        except DuplicateKeyError:
+            # either the chunk is already there, or a concurrent append created the
+            # bucket first (the server won't retry upserts with a $ne filter); the
+            # bucket exists now, so a plain update pushes unless the seq is present
+            await db[BUCKET_COLLECTION].update_one(query, push)
+
+async def migrate_project(db, project: Dict[str, Any]) -> bool:
+    """Copy a pre-bucketing project's arrays into buckets, then start its counters"""
+    update: Dict[str, Any] = {}
+    for kind, (field, counter) in KINDS.items():
+        if counter in project:
+            continue
+        items = [{**item, "seq": seq} for seq, item in enumerate(project.get(field) or [], start=1)]
+        # copy first: the array is only trimmed once every item is in a bucket
+        await _copy_to_buckets(db, project["_id"], kind, items)
+        update[counter] = len(items)
+        update[field] = items[-PROJECT_LATEST_ITEMS:]
+        if kind == "comment":
+            update["open_comment_count"] = sum(1 for i in items if i.get("status") == "open")
+    if not update:
+        return False
+    # appends wait for the counters, so the array can't have changed since it was read
+    guard = {counter: {"$exists": False} for _, counter in KINDS.values() if counter in update}
+    result = await db["project"].update_one({"_id": project["_id"], **guard}, {"$set": update})
+    return result.modified_count == 1
+
+async def append_item(db, project_id: ObjectId, kind: str, item: Dict[str, Any], set_fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Add item to a project; returns the updated project, or None if it doesn't exist"""
+    field, counter = KINDS[kind]
+    increments = {counter: 1}
+    if kind == "comment" and item.get("status") == "open":
+        increments["open_comment_count"] = 1
+    # only projects whose items are already bucketed have the counter
+    numbered = await db["project"].find_one_and_update(
+        {"_id": project_id, counter: {"$exists": True}},
+        {"$inc": increments},
+        projection={counter: 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    if numbered is None:
+        legacy = await db["project"].find_one({"_id": project_id})
+        if legacy is None:
+            return None
+        await migrate_project(db, legacy)
+        return await append_item(db, project_id, kind, item, set_fields)
+
+    item = {**item, "seq": numbered[counter]}
+    await _copy_to_buckets(db, project_id, kind, [item])
+    # $sort keeps the latest items in seq order when appends race
+    return await db["project"].find_one_and_update(
+        {"_id": project_id},
+        {
+            "$push": {field: {"$each": [item], "$sort": {"seq": 1}, "$slice": -PROJECT_LATEST_ITEMS}},
+            "$set": set_fields,
+        },
+        return_document=ReturnDocument.AFTER,
+    )
+
+async def list_items(db, project_id: ObjectId, kind: str, after: int = 0, limit: int = 50) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+    """Items with seq > after, oldest first; returns (items, next cursor)"""
+    items: List[Dict[str, Any]] = []
+    start = _bucket_of(after + 1)
+    cursor = db[BUCKET_COLLECTION].find(
+        {"project_id": project_id, "kind": kind, "bucket": {"$gte": start}},
+        {"items": 1, "_id": 0},
+    ).sort("bucket", 1)
+    async for bucket in cursor:
+        # concurrent appends may land slightly out of order inside a bucket
+        items.extend(sorted((i for i in bucket["items"] if i["seq"] > after), key=lambda i: i["seq"]))
+        if len(items) >= limit:
+            break
+    items = items[:limit]
+    next_after = items[-1]["seq"] if len(items) == limit else None
+    return items, next_after
+
+async def migrate(db) -> int:
+    """Move embedded comments/drafts of all pre-bucketing projects into buckets"""
+    migrated = 0
+    query = {"$or": [{counter: {"$exists": False}} for _, counter in KINDS.values()]}
+    async for project in db["project"].find(query):
+        migrated += await migrate_project(db, project)
+    return migrated
+
+if __name__ == "__main__":
+    from database import async_db, database_configured
+
+    if not database_configured():
+        sys.exit("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    if "--migrate" in sys.argv:
+        print("projects migrated:", asyncio.run(migrate(async_db)))
+    else:
+        sys.exit("usage: python buckets.py --migrate")
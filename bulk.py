@@ -0,0 +1,169 @@
+"""
+Bulk Import
+
+Parses a streamed request body of records (NDJSON or a JSON array), validates them
+with a Pydantic model in chunks and writes each chunk with one unordered
+`insert_many`. Bad rows are reported by their position in the input and never
+abort the rest of the import.
+"""
+
+import os
+import re
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Type
+
+import orjson
+from pydantic import BaseModel, ValidationError
+
+from database import create_documents_async
+
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "1000"))
+
+# (row number, parsed record or None, parse error or None)
+Record = Tuple[int, Any, Any]
+
+async def ndjson_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[Record]:
+    """Parse NDJSON as it streams in; only one partial line is ever buffered"""
+    row = 0
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield _parse(row, line)
+                row += 1
+    if pending.strip():
+        yield _parse(row, pending)
+
+# characters that matter outside strings, and inside them
+_STRUCTURAL = re.compile(rb'["\[\]{},]')
+_STRING_SPECIAL = re.compile(rb'["\\]')
+
+class _ArrayScanner:
+    """Splits a JSON array into the raw bytes of its elements as chunks arrive.
+    Only brackets, commas and strings are tracked; each element is parsed on its own"""
+
+    def __init__(self):
+        self.buf = b""
+        self.pos = 0
+        self.depth = 0
+        self.in_string = False
+        self.start: Optional[int] = None
+        self.elements = 0
+        self.closed = False
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        if self.closed:
+            if chunk.strip():
+                raise ValueError("Unexpected data after the JSON array")
+            return []
+        buf = self.buf + chunk
+        pos = self.pos
+        out: List[bytes] = []
+        while not self.closed:
+            if self.in_string:
+                m = _STRING_SPECIAL.search(buf, pos)
+                if m is None:
+                    pos = len(buf)
+                    break
+                if m.group() == b"\\":
+                    if m.end() == len(buf):
+                        # the escaped character is in the next chunk
+                        pos = m.start()
+                        break
+                    pos = m.end() + 1
+                    continue
+                self.in_string = False
+                pos = m.end()
+                continue
+            if self.depth == 0 and buf[pos:].strip():
+                if not buf[pos:].lstrip().startswith(b"["):
+                    raise ValueError("Expected a JSON array")
+            m = _STRUCTURAL.search(buf, pos)
+            if m is None:
+                pos = len(buf)
+                break
+            token, pos = m.group(), m.end()
+            if token == b'"':
+                self.in_string = True
+            elif token in (b"[", b"{"):
+                self.depth += 1
+                if self.depth == 1:
+                    self.start = pos
+            elif token in (b"]", b"}"):
+                self.depth -= 1
+                if self.depth == 0:
+                    self._element(buf[self.start:m.start()], out, last=True)
+                    self.closed = True
+                    self.start = None
+            elif self.depth == 1:
+                self._element(buf[self.start:m.start()], out, last=False)
+                self.start = pos
+        # keep only the element in progress
+        cut = self.start if self.start is not None else pos
+        self.buf, self.pos = buf[cut:], pos - cut
+        if self.start is not None:
+            self.start = 0
+        return out
+
+    def _element(self, raw: bytes, out: List[bytes], last: bool):
+        # "[]" has no elements; any other empty slot ("[1,]") is reported as a bad row
+        if last and not raw.strip() and self.elements == 0:
+            return
+        out.append(raw)
+        self.elements += 1
+
+    def finish(self):
+        if not self.closed:
+            raise ValueError("Unterminated JSON array" if self.depth else "Expected a JSON array")
+        if self.buf[self.pos:].strip():
+            raise ValueError("Unexpected data after the JSON array")
+
+async def json_array_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[Record]:
+    """Parse a JSON array as it streams in; only the element being received is buffered"""
+    scanner = _ArrayScanner()
+    row = 0
+    try:
+        async for chunk in chunks:
+            for raw in scanner.feed(chunk):
+                yield _parse(row, raw)
+                row += 1
+        scanner.finish()
+    except ValueError as e:
+        yield row, None, str(e)
+
+def _parse(row: int, line: bytes) -> Record:
+    try:
+        return row, orjson.loads(line), None
+    except orjson.JSONDecodeError as e:
+        return row, None, f"Invalid JSON: {e}"
+
+async def import_records(collection_name: str, model: Type[BaseModel], records: AsyncIterator[Record]) -> Dict[str, Any]:
+    inserted = 0
+    errors: List[Dict[str, Any]] = []
+    batch: List[Dict[str, Any]] = []
+    batch_rows: List[int] = []
+
+    async def flush():
+        nonlocal inserted
+        count, write_errors = await create_documents_async(collection_name, batch)
+        inserted += count
+        errors.extend({"row": batch_rows[i], "errors": [msg]} for i, msg in sorted(write_errors.items()))
+        batch.clear()
+        batch_rows.clear()
+
+    async for row, record, parse_error in records:
+        if parse_error is not None:
+            errors.append({"row": row, "errors": [parse_error]})
+            continue
+        try:
+            batch.append(model.model_validate(record).model_dump())
+            batch_rows.append(row)
+        except ValidationError as e:
+            errors.append({"row": row, "errors": e.errors(include_url=False, include_context=False)})
+            continue
+        if len(batch) >= BULK_CHUNK_SIZE:
+            await flush()
+    if batch:
+        await flush()
+    return {"inserted": inserted, "failed": len(errors), "errors": errors}
@@ -0,0 +1,86 @@
+"""
+In-Process Read Cache
+
+Bounded LRU caches with per-entry TTL for hot, rarely-changing reads
+(products). Entries are dropped explicitly by the write paths through
+`invalidate`/`clear`; the TTL only bounds staleness for writes this process
+did not see.
+"""
+
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+# Stored for keys known not to exist, so repeated lookups of bad ids stay cheap
+NOT_FOUND = object()
+
+class TTLCache:
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0, negative_ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        ttl = self.negative_ttl if value is NOT_FOUND else self.ttl
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        self._data.pop(key, None)
+
+    def invalidate_prefix(self, prefix: Hashable):
+        """Drop every tuple key whose first element is prefix"""
+        for key in [k for k in self._data if isinstance(k, tuple) and k and k[0] == prefix]:
+            del self._data[key]
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+_size = int(os.getenv("PRODUCT_CACHE_SIZE", "1024"))
+_ttl = float(os.getenv("PRODUCT_CACHE_TTL", "60"))
+_negative_ttl = float(os.getenv("PRODUCT_CACHE_NEGATIVE_TTL", "10"))
+
+# Keyed by (product_id, fields)
+product_cache = TTLCache(_size, _ttl, _negative_ttl)
+# Keyed by the full query signature of a listing endpoint
+product_list_cache = TTLCache(_size, _ttl)
+
+# Whole /api/analytics payload; dashboards poll it, a few seconds of lag is fine
+analytics_cache = TTLCache(1, float(os.getenv("ANALYTICS_CACHE_TTL", "30")))
+
+def invalidate_product(product_id: Optional[str] = None):
+    """Call after any product write; listings are always dropped since membership may change.
+    Without an id every cached product goes too"""
+    if product_id is not None:
+        product_cache.invalidate_prefix(product_id)
+    else:
+        product_cache.clear()
+    product_list_cache.clear()
@@ -0,0 +1,104 @@
+"""
+Mongo Command Metrics
+
+A pymongo CommandListener timing every command the clients send, as a
+histogram labelled by collection, command, filter shape and the route that
+issued it, exported through `/metrics`. Commands slower than MONGO_SLOW_QUERY_MS
+are logged with the same shape, e.g.
+
+    slow find on product (212.4 ms, route /api/products): {"title": {"$regex": "?"}}
+
+The shape keeps field names and operators and replaces values with "?", so
+queries differing only in their arguments share one series and no user data
+ends up in logs or labels. The route comes from `current_route`, set by the
+request middleware; motor copies the context into its executor threads.
+"""
+
+import json
+import logging
+import os
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, Tuple
+
+from prometheus_client import Counter, Histogram
+from pymongo import monitoring
+
+MONGO_SLOW_QUERY_MS = float(os.getenv("MONGO_SLOW_QUERY_MS", "100"))
+
+logger = logging.getLogger(__name__)
+
+current_route: ContextVar[str] = ContextVar("current_route", default="-")
+
+COMMAND_LATENCY = Histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency",
+    ["collection", "command", "shape", "route"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, float("inf")),
+)
+COMMAND_FAILURES = Counter("mongo_command_failures_total", "Failed MongoDB commands", ["collection", "command", "route"])
+
+def shape(value: Any) -> Any:
+    """Replace the values in a query with "?", keeping keys and operators"""
+    if isinstance(value, dict):
+        return {k: shape(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        # $in lists of any length, or $and/$or clauses, which keep their structure
+        shapes = [shape(v) for v in value]
+        return shapes if any(isinstance(s, (dict, list)) for s in shapes) else ["?"]
+    return "?"
+
+def _pipeline_shape(pipeline) -> Dict[str, Any]:
+    """Stages in order; $match keeps its filter shape, other stages just their name"""
+    return {"pipeline": [{"$match": shape(s["$match"])} if "$match" in s else next(iter(s), "?") for s in pipeline]}
+
+def command_shape(name: str, command) -> Optional[Any]:
+    if name in ("find", "count", "distinct", "findAndModify", "delete", "update"):
+        if name == "find":
+            query = command.get("filter", {})
+        elif name in ("delete", "update"):
+            statements = command.get("deletes" if name == "delete" else "updates") or [{}]
+            query = statements[0].get("q", {})
+        else:
+            query = command.get("query", {})
+        return shape(query)
+    if name == "aggregate":
+        return _pipeline_shape(command.get("pipeline", []))
+    return None
+
+def collection_of(name: str, command) -> str:
+    if name == "getMore":
+        return command.get("collection", "-")
+    target = command.get(name)
+    return target if isinstance(target, str) else "-"
+
+class CommandMetrics(monitoring.CommandListener):
+    def __init__(self):
+        # request_id -> (collection, shape, route); started/succeeded fire on the same thread
+        self._pending: Dict[int, Tuple[str, str, str]] = {}
+
+    def started(self, event):
+        name = event.command_name
+        query = command_shape(name, event.command)
+        self._pending[event.request_id] = (
+            collection_of(name, event.command),
+            json.dumps(query, sort_keys=True) if query is not None else "-",
+            current_route.get(),
+        )
+
+    def succeeded(self, event):
+        info = self._pending.pop(event.request_id, None)
+        if info is None:
+            return
+        collection, query, route = info
+        seconds = event.duration_micros / 1_000_000
+        COMMAND_LATENCY.labels(collection, event.command_name, query, route).observe(seconds)
+        if seconds * 1000 >= MONGO_SLOW_QUERY_MS:
+            logger.warning("slow %s on %s (%.1f ms, route %s): %s", event.command_name, collection, seconds * 1000, route, query)
+
+    def failed(self, event):
+        info = self._pending.pop(event.request_id, None)
+        if info is None:
+            return
+        collection, _, route = info
+        COMMAND_FAILURES.labels(collection, event.command_name, route).inc()
+
+command_metrics = CommandMetrics()
@@ -0,0 +1,116 @@
+"""
+Analytics Counters
+
+Running totals kept in the `stats` collection and bumped with `$inc` on every
+create, so /api/analytics is a single small read instead of collection counts.
+Writes are spread over STATS_SHARDS documents to avoid a single hot document;
+reads sum the shards.
+
+Totals can drift (failed counter bumps, manual edits), so `reconcile`
+recomputes the true values and folds the difference back in:
+
+    python counters.py --reconcile
+
+The recount scans every collection, so run it while writes are quiet: creates
+that land during the scan can be counted twice. A database that has never had
+its totals seeded is reconciled once at startup (`seed_totals`), so existing
+data shows up in /api/analytics straight away.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import sys
+from typing import Dict
+
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+import settings  # noqa: F401  (.env before the reads below)
+
+STATS_COLLECTION = "stats"
+# present once the totals have been seeded from the source collections
+SEEDED_MARKER = "totals_seeded"
+STATS_SHARDS = int(os.getenv("STATS_SHARDS", "8"))
+
+COUNTER_FIELDS = ["products", "orders", "projects", "custom_requests", "revenue", "items_sold"]
+
+# collection -> counter bumped when a document is created in it
+COLLECTION_COUNTERS = {
+    "product": "products",
+    "order": "orders",
+    "project": "projects",
+    "customrequest": "custom_requests",
+}
+
+logger = logging.getLogger(__name__)
+
+async def increment(db, **amounts):
+    """$inc the given counters on a random shard"""
+    shard = random.randrange(STATS_SHARDS)
+    await db[STATS_COLLECTION].update_one({"_id": f"totals:{shard}"}, {"$inc": amounts}, upsert=True)
+
+async def record_created(db, collection_name: str, count: int = 1, **extra):
+    """Best effort: the document is already written, so a failed $inc is only drift for reconcile"""
+    amounts = {COLLECTION_COUNTERS[collection_name]: count, **extra}
+    try:
+        await increment(db, **amounts)
+    except PyMongoError as e:
+        logger.warning("counter update failed for %s %s: %s", collection_name, amounts, e)
+
+async def read_totals(db) -> Dict[str, float]:
+    totals = {field: 0 for field in COUNTER_FIELDS}
+    async for shard in db[STATS_COLLECTION].find({"_id": {"$regex": "^totals:"}}):
+        for field in COUNTER_FIELDS:
+            totals[field] += shard.get(field, 0)
+    return totals
+
+async def compute_totals(db) -> Dict[str, float]:
+    """Recount everything from the source collections (full scans, run offline)"""
+    totals = {field: 0 for field in COUNTER_FIELDS}
+    for collection, field in COLLECTION_COUNTERS.items():
+        totals[field] = await db[collection].count_documents({})
+    pipeline = [{"$group": {
+        "_id": None,
+        "revenue": {"$sum": "$subtotal"},
+        "items_sold": {"$sum": {"$sum": "$items.quantity"}},
+    }}]
+    async for row in db["order"].aggregate(pipeline):
+        totals["revenue"] = row["revenue"]
+        totals["items_sold"] = row["items_sold"]
+    return totals
+
+async def reconcile(db) -> Dict[str, float]:
+    """Correct drift by $inc-ing the difference between a recount and the shards.
+    The shards are read first; creates during the recount may be counted twice"""
+    current = await read_totals(db)
+    actual = await compute_totals(db)
+    drift = {field: actual[field] - current[field] for field in COUNTER_FIELDS if actual[field] != current[field]}
+    if drift:
+        await db[STATS_COLLECTION].update_one({"_id": "totals:0"}, {"$inc": drift}, upsert=True)
+    return drift
+
+async def seed_totals(db) -> bool:
+    """Reconcile once per database so totals start from the existing data; other workers skip"""
+    try:
+        await db[STATS_COLLECTION].insert_one({"_id": SEEDED_MARKER})
+    except DuplicateKeyError:
+        return False
+    try:
+        await reconcile(db)
+    except BaseException:
+        # let the next start try again
+        await db[STATS_COLLECTION].delete_one({"_id": SEEDED_MARKER})
+        raise
+    return True
+
+if __name__ == "__main__":
+    from database import async_db, database_configured
+
+    if not database_configured():
+        sys.exit("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    if "--reconcile" in sys.argv:
+        print("drift corrected:", asyncio.run(reconcile(async_db)) or "none")
+    else:
+        print(asyncio.run(read_totals(async_db)))
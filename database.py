@@ -3,32 +3,129 @@ Database Helper Functions
 
 MongoDB helper functions ready to use in your backend code.
 Import and use these functions in your API endpoints for database operations.
+
+Nothing connects at import time: `db` and `async_db` create their client on
+first use (or explicitly via `get_db()`/`get_async_db()`), and `.env` is read
+at that point if the process hasn't loaded it already.
 """
 
 from pymongo import MongoClient
+from pymongo.errors import BulkWriteError
+from motor.motor_asyncio import AsyncIOMotorClient
 from datetime import datetime, timezone
+import asyncio
 import os
-from dotenv import load_dotenv
-from typing import Union
+import threading
+from typing import List, Union
 from pydantic import BaseModel
 
-# Load environment variables from .env file
-load_dotenv()
+import settings  # noqa: F401  (.env before command_metrics reads its threshold)
+from command_metrics import command_metrics
+from pool_metrics import pool_metrics
 
 _client = None
-db = None
+_async_client = None
+# Database objects are cached so the hot path is one global read, no lock
+_sync_database = None
+_async_database = None
+_lock = threading.Lock()
+
+def _settings():
+    """DATABASE_URL/DATABASE_NAME"""
+    return os.getenv("DATABASE_URL"), os.getenv("DATABASE_NAME")
+
+# MongoClient keyword -> environment variable; unset ones keep the driver default
+_CLIENT_OPTIONS_ENV = {
+    "maxPoolSize": "MONGO_MAX_POOL_SIZE",
+    "minPoolSize": "MONGO_MIN_POOL_SIZE",
+    "maxIdleTimeMS": "MONGO_MAX_IDLE_TIME_MS",
+    "waitQueueTimeoutMS": "MONGO_WAIT_QUEUE_TIMEOUT_MS",
+    "serverSelectionTimeoutMS": "MONGO_SERVER_SELECTION_TIMEOUT_MS",
+    "connectTimeoutMS": "MONGO_CONNECT_TIMEOUT_MS",
+    "socketTimeoutMS": "MONGO_SOCKET_TIMEOUT_MS",
+}
+
+def _client_options() -> dict:
+    """Pool, timeout and compression settings from the environment"""
+    options = {name: int(os.environ[env]) for name, env in _CLIENT_OPTIONS_ENV.items() if os.getenv(env)}
+    # e.g. "zstd,snappy,zlib"; zstd/snappy need pymongo[zstd,snappy], unavailable ones are skipped
+    if os.getenv("MONGO_COMPRESSORS"):
+        options["compressors"] = os.environ["MONGO_COMPRESSORS"]
+    options["event_listeners"] = [pool_metrics, command_metrics]
+    return options
+
+def database_configured() -> bool:
+    database_url, database_name = _settings()
+    return bool(database_url and database_name)
+
+def _connect(client_class):
+    database_url, database_name = _settings()
+    if not (database_url and database_name):
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+    client = client_class(database_url, **_client_options())
+    return client, client[database_name]
+
+def get_db():
+    """Blocking (pymongo) database, created on first call"""
+    global _client, _sync_database
+    database = _sync_database
+    if database is None:
+        with _lock:
+            if _sync_database is None:
+                _client, _sync_database = _connect(MongoClient)
+            database = _sync_database
+    return database
+
+def get_async_db():
+    """Motor database, created on first call"""
+    global _async_client, _async_database
+    database = _async_database
+    if database is None:
+        with _lock:
+            if _async_database is None:
+                _async_client, _async_database = _connect(AsyncIOMotorClient)
+            database = _async_database
+    return database
 
-database_url = os.getenv("DATABASE_URL")
-database_name = os.getenv("DATABASE_NAME")
+def close_clients():
+    global _client, _async_client, _sync_database, _async_database
+    with _lock:
+        for client in (_client, _async_client):
+            if client is not None:
+                client.close()
+        _client = _async_client = None
+        _sync_database = _async_database = None
 
-if database_url and database_name:
-    _client = MongoClient(database_url)
-    db = _client[database_name]
+async def prewarm_pool(connections: int):
+    """Open up to `connections` pooled connections now instead of on the first requests"""
+    database = get_async_db()
+    # concurrent pings each need their own connection
+    await asyncio.gather(*(database.command("ping") for _ in range(connections)))
+
+class _LazyDatabase:
+    """Stands in for a Database until first use so importing this module never connects"""
+
+    def __init__(self, getter):
+        self._getter = getter
+
+    def __getitem__(self, name):
+        return self._getter()[name]
+
+    def __getattr__(self, name):
+        return getattr(self._getter(), name)
+
+db = _LazyDatabase(get_db)
+async_db = _LazyDatabase(get_async_db)
+
+def _bson_now():
+    """Current UTC time as the clients read it back: naive (no tz_aware) and millisecond precision"""
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
 
 # Helper functions for common database operations
 def create_document(collection_name: str, data: Union[BaseModel, dict]):
-    """Insert a single document with timestamp"""
-    if db is None:
+    """Insert a single document with timestamp and return the stored document"""
+    if not database_configured():
         raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
 
     # Convert Pydantic model to dict if needed
@@ -37,15 +134,17 @@ def create_document(collection_name: str, data: Union[BaseModel, dict]):
     else:
         data_dict = data.copy()
 
-    data_dict['created_at'] = datetime.now(timezone.utc)
-    data_dict['updated_at'] = datetime.now(timezone.utc)
+    now = _bson_now()
+    data_dict['created_at'] = now
+    data_dict['updated_at'] = now
 
-    result = db[collection_name].insert_one(data_dict)
-    return str(result.inserted_id)
+    # insert_one sets `_id` on data_dict, so it already is the stored document
+    db[collection_name].insert_one(data_dict)
+    return data_dict
 
 def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None):
     """Get documents from collection"""
-    if db is None:
+    if not database_configured():
         raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
     
     cursor = db[collection_name].find(filter_dict or {})
@@ -53,3 +152,58 @@ def get_documents(collection_name: str, filter_dict: dict = None, limit: int = N
         cursor = cursor.limit(limit)
     
     return list(cursor)
+
+
+# Async (Motor) versions for use inside `async def` routes
+async def create_document_async(collection_name: str, data: Union[BaseModel, dict]):
+    """Insert a single document with timestamp and return the stored document without blocking the event loop"""
+    if not database_configured():
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    if isinstance(data, BaseModel):
+        data_dict = data.model_dump()
+    else:
+        data_dict = data.copy()
+
+    now = _bson_now()
+    data_dict['created_at'] = now
+    data_dict['updated_at'] = now
+
+    await async_db[collection_name].insert_one(data_dict)
+    return data_dict
+
+async def create_documents_async(collection_name: str, data_list: List[Union[BaseModel, dict]]):
+    """Insert many documents with timestamps in one unordered batch; returns (inserted count, {index: error message})"""
+    if not database_configured():
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+    if not data_list:
+        return 0, {}
+
+    now = _bson_now()
+    docs = []
+    for data in data_list:
+        data_dict = data.model_dump() if isinstance(data, BaseModel) else data.copy()
+        data_dict['created_at'] = now
+        data_dict['updated_at'] = now
+        docs.append(data_dict)
+
+    # unordered: one bad document doesn't stop the rest of the batch
+    try:
+        result = await async_db[collection_name].insert_many(docs, ordered=False)
+        return len(result.inserted_ids), {}
+    except BulkWriteError as e:
+        errors = {err["index"]: err.get("errmsg", "write error") for err in e.details.get("writeErrors", [])}
+        return e.details.get("nInserted", 0), errors
+
+async def get_documents_async(collection_name: str, filter_dict: dict = None, limit: int = None, projection: dict = None, sort: list = None):
+    """Get documents from collection without blocking the event loop"""
+    if not database_configured():
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    cursor = async_db[collection_name].find(filter_dict or {}, projection)
+    if sort:
+        cursor = cursor.sort(sort)
+    if limit:
+        cursor = cursor.limit(limit)
+
+    return await cursor.to_list(length=None)
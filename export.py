@@ -0,0 +1,74 @@
+"""
+Streaming Export
+
+Row generators for /api/export/{collection}. The Mongo cursor is iterated
+batch by batch and every row is encoded and yielded as soon as it arrives, so
+memory stays flat no matter how large the collection is.
+
+Only `product` is public. The other collections hold customer emails, names,
+orders and notes, so exporting them needs `X-Export-Token: <EXPORT_TOKEN>`;
+without EXPORT_TOKEN set they can't be exported at all.
+"""
+
+import csv
+import hmac
+import io
+import os
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from responses import dumps
+
+EXPORTABLE_COLLECTIONS = {"product", "order", "project", "customrequest"}
+PUBLIC_EXPORTS = {"product"}
+EXPORT_TOKEN = os.getenv("EXPORT_TOKEN", "")
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+# rows are grouped into chunks of about this size before being sent
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+def export_allowed(collection: str, token: Optional[str]) -> bool:
+    if collection in PUBLIC_EXPORTS:
+        return True
+    return bool(EXPORT_TOKEN) and token is not None and hmac.compare_digest(token, EXPORT_TOKEN)
+
+def _row(doc: Dict[str, Any]) -> Dict[str, Any]:
+    doc["id"] = doc.pop("_id", None)
+    return doc
+
+async def chunked(lines: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Join small lines so the server isn't asked to send one write per row"""
+    parts: List[bytes] = []
+    size = 0
+    async for line in lines:
+        parts.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_BYTES:
+            yield b"".join(parts)
+            parts, size = [], 0
+    if parts:
+        yield b"".join(parts)
+
+async def ndjson_rows(cursor) -> AsyncIterator[bytes]:
+    async for doc in cursor:
+        yield dumps(_row(doc)) + b"\n"
+
+def _cell(value: Any) -> Any:
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    # nested documents/arrays as compact JSON, ObjectId/datetime as their plain string
+    encoded = dumps(value).decode()
+    return encoded[1:-1] if encoded.startswith('"') else encoded
+
+def _csv_line(values: List[Any]) -> bytes:
+    buf = io.StringIO()
+    csv.writer(buf).writerow(values)
+    return buf.getvalue().encode()
+
+async def csv_rows(cursor) -> AsyncIterator[bytes]:
+    """CSV with columns taken from the first document; later extra keys are dropped"""
+    columns = None
+    async for doc in cursor:
+        doc = _row(doc)
+        if columns is None:
+            columns = ["id"] + [k for k in doc if k != "id"]
+            yield _csv_line(columns)
+        yield _csv_line([_cell(doc.get(c)) for c in columns])
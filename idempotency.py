@@ -0,0 +1,89 @@
+"""
+Idempotency Keys
+
+POST handlers that create records can be retried safely by sending an
+`Idempotency-Key` header. The first request with a key claims it in the
+`idempotency_key` collection (unique `_id`, TTL on `created_at`) and stores its
+response; replays with the same key and payload get that stored response back
+without touching the database again. Completed responses are also kept in an
+in-process cache so hot retries from the same worker skip Mongo entirely.
+"""
+
+import hashlib
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Optional, Tuple
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+from pymongo.errors import DuplicateKeyError
+
+import settings  # noqa: F401  (.env before the reads below; indexes.py uses IDEMPOTENCY_TTL)
+from cache import TTLCache
+
+IDEMPOTENCY_COLLECTION = "idempotency_key"
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", "86400"))
+# a claim older than this is assumed abandoned (crashed worker) and can be taken over
+IDEMPOTENCY_PENDING_TIMEOUT = int(os.getenv("IDEMPOTENCY_PENDING_TIMEOUT", "60"))
+
+_completed = TTLCache(int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000")), min(IDEMPOTENCY_TTL, 600))
+
+Handler = Callable[[], Awaitable[Tuple[int, bytes]]]
+
+def fingerprint(payload: BaseModel) -> str:
+    return hashlib.sha256(payload.model_dump_json().encode()).hexdigest()
+
+def _replay(record, digest: str) -> Tuple[int, bytes, bool]:
+    if record["fingerprint"] != digest:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+    return record["status_code"], record["body"], True
+
+async def _claim(db, key_id: str, digest: str) -> Optional[dict]:
+    """Claim the key; returns the existing completed record instead if there is one"""
+    now = datetime.now(timezone.utc)
+    try:
+        await db[IDEMPOTENCY_COLLECTION].insert_one({"_id": key_id, "state": "pending", "fingerprint": digest, "created_at": now})
+        return None
+    except DuplicateKeyError:
+        pass
+    existing = await db[IDEMPOTENCY_COLLECTION].find_one({"_id": key_id})
+    if existing is None:
+        # expired or released between our insert and read
+        return await _claim(db, key_id, digest)
+    if existing["state"] == "done":
+        return existing
+    stale = now - timedelta(seconds=IDEMPOTENCY_PENDING_TIMEOUT)
+    taken = await db[IDEMPOTENCY_COLLECTION].find_one_and_update(
+        {"_id": key_id, "state": "pending", "created_at": {"$lt": stale}},
+        {"$set": {"fingerprint": digest, "created_at": now}},
+    )
+    if taken is None:
+        raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+    return None
+
+async def run_idempotent(db, scope: str, key: Optional[str], payload: BaseModel, handler: Handler) -> Tuple[int, bytes, bool]:
+    """Run handler at most once per (scope, key); returns (status code, body, replayed)"""
+    if not key:
+        status_code, body = await handler()
+        return status_code, body, False
+    key_id = f"{scope}:{key}"
+    digest = fingerprint(payload)
+
+    cached = _completed.get(key_id)
+    if cached is not None:
+        return _replay(cached, digest)
+    existing = await _claim(db, key_id, digest)
+    if existing is not None:
+        _completed.set(key_id, existing)
+        return _replay(existing, digest)
+
+    try:
+        status_code, body = await handler()
+    except BaseException:
+        # let the client retry with the same key
+        await db[IDEMPOTENCY_COLLECTION].delete_one({"_id": key_id, "state": "pending"})
+        raise
+    record = {"state": "done", "fingerprint": digest, "status_code": status_code, "body": body}
+    await db[IDEMPOTENCY_COLLECTION].update_one({"_id": key_id}, {"$set": record})
+    _completed.set(key_id, record)
+    return status_code, body, False
@@ -0,0 +1,95 @@
+"""
+Index Registry
+
+Declarative list of the indexes every collection needs, applied idempotently
+at application startup and from the command line:
+
+    python indexes.py            # report missing/extra indexes
+    python indexes.py --apply    # create missing indexes
+    python indexes.py --apply --drop-extra
+"""
+
+import asyncio
+import sys
+from typing import Dict, List
+
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+
+from idempotency import IDEMPOTENCY_COLLECTION, IDEMPOTENCY_TTL
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "product": [
+        IndexModel(
+            [("title", TEXT), ("description", TEXT), ("category", TEXT), ("style", TEXT)],
+            weights={"title": 10, "category": 5, "style": 3, "description": 1},
+            name="product_text",
+        ),
+        # prefix search pages by (title, _id)
+        IndexModel([("title", ASCENDING), ("_id", ASCENDING)], name="title_1__id_1"),
+        IndexModel([("category", ASCENDING), ("style", ASCENDING), ("color", ASCENDING)], name="category_1_style_1_color_1"),
+        IndexModel([("style", ASCENDING)], name="style_1"),
+        IndexModel([("color", ASCENDING)], name="color_1"),
+        IndexModel([("rating", DESCENDING)], name="rating_-1"),
+        # only featured products are ever queried by this flag
+        IndexModel([("featured", ASCENDING)], name="featured_1", partialFilterExpression={"featured": True}),
+        IndexModel([("updated_at", ASCENDING)], name="updated_at_1"),
+    ],
+    # exports filter on since=updated_at
+    "order": [
+        IndexModel([("updated_at", ASCENDING)], name="updated_at_1"),
+    ],
+    "customrequest": [
+        IndexModel([("updated_at", ASCENDING)], name="updated_at_1"),
+    ],
+    "project": [
+        # listings page by _id within the filtered set
+        IndexModel([("client_email", ASCENDING), ("status", ASCENDING), ("_id", ASCENDING)], name="client_email_1_status_1__id_1"),
+        IndexModel([("status", ASCENDING), ("_id", ASCENDING)], name="status_1__id_1"),
+        IndexModel([("updated_at", ASCENDING)], name="updated_at_1"),
+    ],
+    # one bucket per (project, kind, bucket number)
+    "project_bucket": [
+        IndexModel([("project_id", ASCENDING), ("kind", ASCENDING), ("bucket", ASCENDING)], name="project_id_1_kind_1_bucket_1", unique=True),
+    ],
+    # stored responses expire on their own
+    IDEMPOTENCY_COLLECTION: [
+        IndexModel([("created_at", ASCENDING)], name="created_at_1", expireAfterSeconds=IDEMPOTENCY_TTL),
+    ],
+}
+
+async def index_report(db) -> Dict[str, Dict[str, List[str]]]:
+    """Compare registered indexes with the ones present in the database, by name"""
+    report = {}
+    for collection, models in INDEXES.items():
+        wanted = {m.document["name"] for m in models}
+        existing = set((await db[collection].index_information()).keys()) - {"_id_"}
+        report[collection] = {
+            "missing": sorted(wanted - existing),
+            "extra": sorted(existing - wanted),
+        }
+    return report
+
+async def ensure_indexes(db, drop_extra: bool = False) -> Dict[str, Dict[str, List[str]]]:
+    """Create every registered index (no-op for ones that already exist)"""
+    report = await index_report(db)
+    for collection, models in INDEXES.items():
+        await db[collection].create_indexes(models)
+        if drop_extra:
+            for name in report[collection]["extra"]:
+                await db[collection].drop_index(name)
+    return report
+
+if __name__ == "__main__":
+    from database import async_db, database_configured
+
+    if not database_configured():
+        sys.exit("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    apply = "--apply" in sys.argv
+    drop_extra = "--drop-extra" in sys.argv
+    if apply:
+        report = asyncio.run(ensure_indexes(async_db, drop_extra=drop_extra))
+    else:
+        report = asyncio.run(index_report(async_db))
+    for collection, diff in report.items():
+        print(f"{collection}: missing={diff['missing'] or '-'} extra={diff['extra'] or '-'}")
@@ -0,0 +1,81 @@
+"""
+Cross-Worker Cache Invalidation
+
+Each uvicorn worker runs one change-stream watcher over the collections it
+caches and drops the matching in-process cache entries whenever a document
+changes, no matter which worker (or script) made the write.
+
+The resume token is kept across reconnects so transient network errors don't
+lose events. If the stream can't be resumed (history rolled off the oplog,
+collection dropped) every cache is cleared, since events may have been missed.
+A restarted worker starts with empty caches, so it has nothing to catch up on.
+Change streams need a replica set; on a standalone server the watcher logs
+once and exits, leaving the cache TTLs as the only bound on staleness.
+"""
+
+import asyncio
+import logging
+import os
+from typing import Callable, Dict, Optional
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from cache import invalidate_product
+
+logger = logging.getLogger(__name__)
+
+# collection -> invalidator(document_id or None for "everything")
+WATCHED: Dict[str, Callable[[Optional[str]], None]] = {
+    "product": invalidate_product,
+}
+
+# ChangeStreamHistoryLost, ChangeStreamFatalError, InvalidResumeToken
+_UNRESUMABLE_CODES = {280, 286, 260}
+# "The $changeStream stage is only supported on replica sets"
+_NOT_SUPPORTED_CODES = {40573}
+
+RETRY_DELAY = float(os.getenv("CACHE_WATCH_RETRY_DELAY", "1"))
+
+def _invalidate_all():
+    for invalidator in WATCHED.values():
+        invalidator(None)
+
+def _apply(change: dict):
+    collection = change.get("ns", {}).get("coll")
+    invalidator = WATCHED.get(collection)
+    if invalidator is None:
+        _invalidate_all()
+        return
+    document_key = change.get("documentKey", {}).get("_id")
+    invalidator(str(document_key) if document_key is not None else None)
+
+async def watch_invalidations(db):
+    """Run until cancelled, invalidating caches for every change event"""
+    pipeline = [{"$match": {"$or": [{"ns.coll": {"$in": list(WATCHED)}}, {"operationType": {"$in": ["dropDatabase", "invalidate"]}}]}}]
+    resume_token = None
+    while True:
+        try:
+            async with db.watch(pipeline, resume_after=resume_token) as stream:
+                logger.info("cache invalidation watcher started")
+                async for change in stream:
+                    _apply(change)
+                    resume_token = stream.resume_token
+                    if change.get("operationType") == "invalidate":
+                        # the stream is closed for good; start a fresh one
+                        resume_token = None
+                        break
+        except asyncio.CancelledError:
+            raise
+        except OperationFailure as e:
+            if e.code in _NOT_SUPPORTED_CODES:
+                logger.warning("change streams unavailable, cache invalidation is TTL-only: %s", e)
+                return
+            if e.code in _UNRESUMABLE_CODES:
+                logger.warning("change stream can't resume, clearing caches: %s", e)
+                resume_token = None
+                _invalidate_all()
+            else:
+                logger.warning("change stream failed: %s", e)
+        except PyMongoError as e:
+            logger.warning("change stream interrupted: %s", e)
+        await asyncio.sleep(RETRY_DELAY)
@@ -1,14 +1,56 @@
+import asyncio
 import os
+import re
+from contextlib import asynccontextmanager, suppress
 from typing import List, Optional, Any, Dict
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel, Field, EmailStr
 from datetime import datetime, timezone
 from bson import ObjectId
+from pymongo import ReturnDocument
 
-from database import db, create_document, get_documents
+# the modules below read their settings from the environment when imported
+import settings  # noqa: F401
+from database import async_db as db, close_clients, create_document_async, database_configured, get_documents_async, prewarm_pool
+from buckets import SUMMARY_PROJECTION, append_item, list_items
+from bulk import import_records, json_array_records, ndjson_records
+from counters import read_totals, record_created, seed_totals
+from export import EXPORTABLE_COLLECTIONS, EXPORT_BATCH_SIZE, chunked, csv_rows, export_allowed, ndjson_rows
+from idempotency import run_idempotent
+from indexes import ensure_indexes
+from invalidation import watch_invalidations
+from metrics import MetricsMiddleware, render_metrics, worker_exited
+from cache import NOT_FOUND, analytics_cache, invalidate_product, product_cache, product_list_cache
+from pagination import InvalidCursor, keyset_filter, keyset_sort, next_cursor
+from pool_metrics import pool_metrics
+from profiling import ProfilingMiddleware, profile_path, profile_report, profiling_enabled, token_valid
+from pricing import PRICE_TOLERANCE, PricingError, price_items
+from responses import APIResponse, dumps
 
-app = FastAPI(title="Design Studio API")
+# --------- Lifespan ---------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    watcher = None
+    if database_configured():
+        await ensure_indexes(db)
+        await seed_totals(db)
+        prewarm = int(os.getenv("MONGO_PREWARM_CONNECTIONS", "0"))
+        if prewarm > 0:
+            await prewarm_pool(prewarm)
+        if os.getenv("CACHE_WATCH", "1") != "0":
+            watcher = asyncio.create_task(watch_invalidations(db))
+    yield
+    if watcher is not None:
+        watcher.cancel()
+        # let it unwind before its client goes away
+        with suppress(asyncio.CancelledError):
+            await watcher
+    close_clients()
+    worker_exited()
+
+app = FastAPI(title="Design Studio API", default_response_class=APIResponse, lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -16,7 +58,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Idempotent-Replayed", "X-Profile-Id"],
 )
+if profiling_enabled():
+    app.add_middleware(ProfilingMiddleware, fastapi_app=app)
+# outermost, so CORS preflights and error responses are measured too
+app.add_middleware(MetricsMiddleware, fastapi_app=app)
 
 # --------- Helpers ---------
 class PyObjectId(ObjectId):
@@ -35,14 +82,41 @@ class PyObjectId(ObjectId):
 def serialize_doc(doc: Dict[str, Any]) -> Dict[str, Any]:
     if not doc:
         return doc
-    doc["id"] = str(doc.get("_id"))
-    doc.pop("_id", None)
-    # convert datetimes
-    for k, v in list(doc.items()):
-        if isinstance(v, datetime):
-            doc[k] = v.isoformat()
+    # In place and O(1): nested ObjectId/datetime/Decimal128 values are left
+    # for APIResponse, which encodes them during its single pass
+    doc["id"] = doc.pop("_id", None)
     return doc
 
+# Default projections: listings only ship what a card/row needs
+PRODUCT_CARD_FIELDS = ["title", "price", "images", "category", "style", "color", "featured", "rating", "in_stock"]
+PROJECT_ROW_FIELDS = ["title", "client_email", "status", "request_id", "created_at", "updated_at", "approved_at"]
+
+def parse_fields(fields: Optional[str], default: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+    """Turn a `fields=a,b,c` query value into a Mongo projection; `*` means the whole document"""
+    if fields is None:
+        names = default
+    elif fields.strip() == "*":
+        names = None
+    else:
+        names = [f.strip() for f in fields.split(",") if f.strip()]
+        if not names or any(f.startswith("$") for f in names):
+            raise HTTPException(status_code=400, detail="Invalid fields")
+    if names is None:
+        return None
+    return {f: 1 for f in names}
+
+async def idempotent_response(scope: str, key: Optional[str], payload: BaseModel, handler) -> APIResponse:
+    status_code, body, replayed = await run_idempotent(db, scope, key, payload, handler)
+    return APIResponse(body, status_code=status_code, headers={"Idempotent-Replayed": "true"} if replayed else None)
+
+def cursor_headers(cursor: Optional[str]) -> Optional[Dict[str, str]]:
+    return {"X-Next-Cursor": cursor} if cursor else None
+
+def project_oid(project_id: str) -> ObjectId:
+    if not ObjectId.is_valid(project_id):
+        raise HTTPException(status_code=400, detail="Invalid project id")
+    return ObjectId(project_id)
+
 # --------- Models (Requests) ---------
 class ProductIn(BaseModel):
     title: str
@@ -89,12 +163,17 @@ class ProofCommentIn(BaseModel):
 
 # --------- Public Routes ---------
 @app.get("/")
-def root():
+async def root():
     return {"message": "Design Studio Backend Running"}
 
 @app.get("/api/products")
-def list_products(category: Optional[str] = None, style: Optional[str] = None, color: Optional[str] = None, q: Optional[str] = None, limit: int = 24):
+async def list_products(category: Optional[str] = None, style: Optional[str] = None, color: Optional[str] = None, q: Optional[str] = None, search: str = Query("text", pattern="^(text|prefix)$"), after: Optional[str] = None, fields: Optional[str] = None, limit: int = 24):
     filter_q: Dict[str, Any] = {}
+    projection = parse_fields(fields, PRODUCT_CARD_FIELDS)
+    sort = [("_id", 1)]
+    text_search = bool(q) and search == "text"
+    if text_search and after:
+        raise HTTPException(status_code=400, detail="Cursor pagination is not supported for text search")
     if category:
         filter_q["category"] = category
     if style:
@@ -102,70 +181,143 @@ def list_products(category: Optional[str] = None, style: Optional[str] = None, c
     if color:
         filter_q["color"] = color
     if q:
-        filter_q["title"] = {"$regex": q, "$options": "i"}
-    docs = get_documents("product", filter_q, limit)
-    return [serialize_doc(d) for d in docs]
+        if text_search:
+            # served by the weighted text index, best matches first
+            filter_q["$text"] = {"$search": q}
+            projection = {**(projection or {}), "score": {"$meta": "textScore"}}
+            sort = [("score", {"$meta": "textScore"})]
+        else:
+            # anchored, case-sensitive prefix so the title index can be used
+            filter_q["title"] = {"$regex": "^" + re.escape(q)}
+            sort = keyset_sort([("title", 1)])
+            if projection is not None:
+                # the cursor is built from the sort key
+                projection["title"] = 1
+    cache_key = ("list", category, style, color, q, search, after, fields, limit)
+    cached = product_list_cache.get(cache_key)
+    if cached is not None:
+        body, cursor = cached
+        return APIResponse(body, headers=cursor_headers(cursor))
+    try:
+        filter_q = keyset_filter(filter_q, sort, after)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    docs = await get_documents_async("product", filter_q, limit, projection=projection, sort=sort)
+    cursor = None if text_search else next_cursor(docs, sort, limit)
+    body = dumps([serialize_doc(d) for d in docs])
+    product_list_cache.set(cache_key, (body, cursor))
+    return APIResponse(body, headers=cursor_headers(cursor))
 
 @app.get("/api/products/featured")
-def featured_products(limit: int = 8):
-    docs = db["product"].find({"featured": True}).limit(limit)
-    return [serialize_doc(d) for d in docs]
+async def featured_products(fields: Optional[str] = None, limit: int = 8):
+    cache_key = ("featured", fields, limit)
+    body = product_list_cache.get(cache_key)
+    if body is None:
+        projection = parse_fields(fields, PRODUCT_CARD_FIELDS)
+        docs = await db["product"].find({"featured": True}, projection).limit(limit).to_list(length=None)
+        body = dumps([serialize_doc(d) for d in docs])
+        product_list_cache.set(cache_key, body)
+    return APIResponse(body)
 
 @app.get("/api/products/{product_id}")
-def get_product(product_id: str):
-    try:
-        doc = db["product"].find_one({"_id": ObjectId(product_id)})
-        if not doc:
-            raise HTTPException(status_code=404, detail="Product not found")
-        return serialize_doc(doc)
-    except Exception:
+async def get_product(product_id: str, fields: Optional[str] = None):
+    if not ObjectId.is_valid(product_id):
         raise HTTPException(status_code=400, detail="Invalid product id")
+    # canonical spelling, so invalidation (which uses str(_id)) finds every entry
+    product_id = str(ObjectId(product_id))
+    cache_key = (product_id, fields)
+    body = product_cache.get(cache_key)
+    if body is None:
+        doc = await db["product"].find_one({"_id": ObjectId(product_id)}, parse_fields(fields))
+        body = dumps(serialize_doc(doc)) if doc else NOT_FOUND
+        product_cache.set(cache_key, body)
+    if body is NOT_FOUND:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return APIResponse(body)
 
 @app.post("/api/products", status_code=201)
-def create_product(payload: ProductIn):
+async def create_product(payload: ProductIn):
     product = payload.dict()
-    _id = create_document("product", product)
-    doc = db["product"].find_one({"_id": ObjectId(_id)})
-    return serialize_doc(doc)
+    doc = await create_document_async("product", product)
+    await record_created(db, "product")
+    invalidate_product(str(doc["_id"]))
+    return APIResponse(serialize_doc(doc), status_code=201)
+
+@app.post("/api/products/bulk")
+async def bulk_import_products(request: Request):
+    """Import NDJSON or a JSON array of products, both parsed as the body streams in"""
+    if "ndjson" in request.headers.get("content-type", ""):
+        records = ndjson_records(request.stream())
+    else:
+        records = json_array_records(request.stream())
+    summary = await import_records("product", ProductIn, records)
+    if summary["inserted"]:
+        await record_created(db, "product", count=summary["inserted"])
+        invalidate_product()
+    return APIResponse(summary)
 
 @app.post("/api/checkout", status_code=201)
-def checkout(payload: CheckoutRequest):
-    order_doc = {
-        "email": payload.email,
-        "items": [i.dict() for i in payload.items],
-        "subtotal": payload.subtotal,
-        "coupon_code": payload.coupon_code,
-        "notes": payload.notes,
-        "status": "paid",
-        "download_links": [f"/downloads/{i.product_id}.zip" for i in payload.items],
-        "invoice_url": "/invoices/mock.pdf",
-    }
-    order_id = create_document("order", order_doc)
-    saved = db["order"].find_one({"_id": ObjectId(order_id)})
-    return serialize_doc(saved)
+async def checkout(payload: CheckoutRequest, idempotency_key: Optional[str] = Header(None)):
+    async def place_order():
+        try:
+            items, subtotal = await price_items(db, [i.dict() for i in payload.items])
+        except PricingError as e:
+            raise HTTPException(status_code=422, detail=e.problems)
+        if abs(subtotal - payload.subtotal) > PRICE_TOLERANCE:
+            raise HTTPException(status_code=422, detail=[{"error": "Subtotal mismatch", "expected": subtotal}])
+        order_doc = {
+            "email": payload.email,
+            "items": items,
+            "subtotal": subtotal,
+            "coupon_code": payload.coupon_code,
+            "notes": payload.notes,
+            "status": "paid",
+            "download_links": [f"/downloads/{i.product_id}.zip" for i in payload.items],
+            "invoice_url": "/invoices/mock.pdf",
+        }
+        saved = await create_document_async("order", order_doc)
+        await record_created(db, "order", revenue=subtotal, items_sold=sum(i.quantity for i in payload.items))
+        return 201, dumps(serialize_doc(saved))
+
+    return await idempotent_response("checkout", idempotency_key, payload, place_order)
 
 @app.post("/api/request-custom", status_code=201)
-def request_custom(payload: CustomRequestIn):
-    doc = payload.dict()
-    doc.update({
-        "status": "new",
-        "revision_round": 0,
-        "project_id": None,
-    })
-    req_id = create_document("customrequest", doc)
-    saved = db["customrequest"].find_one({"_id": ObjectId(req_id)})
-    return serialize_doc(saved)
+async def request_custom(payload: CustomRequestIn, idempotency_key: Optional[str] = Header(None)):
+    async def save_request():
+        doc = payload.dict()
+        doc.update({
+            "status": "new",
+            "revision_round": 0,
+            "project_id": None,
+        })
+        saved = await create_document_async("customrequest", doc)
+        await record_created(db, "customrequest")
+        return 201, dumps(serialize_doc(saved))
+
+    return await idempotent_response("request-custom", idempotency_key, payload, save_request)
 
 # --------- Designer/Admin/Client Flows ---------
 @app.get("/api/projects")
-def list_projects(email: Optional[str] = None, status: Optional[str] = None, limit: int = 50):
+async def list_projects(email: Optional[str] = None, status: Optional[str] = None, after: Optional[str] = None, fields: Optional[str] = None, view: str = Query("row", pattern="^(row|summary)$"), limit: int = 50):
     q: Dict[str, Any] = {}
+    projection = parse_fields(fields, PROJECT_ROW_FIELDS)
+    sort = [("_id", 1)]
     if email:
         q["client_email"] = email
     if status:
         q["status"] = status
-    docs = db["project"].find(q).limit(limit)
-    return [serialize_doc(d) for d in docs]
+    try:
+        q = keyset_filter(q, sort, after)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if view == "summary":
+        # counts and latest draft computed server-side, drafts/comments never leave Mongo
+        pipeline = [{"$match": q}, {"$sort": dict(sort)}, {"$limit": limit}, {"$project": SUMMARY_PROJECTION}]
+        docs = await db["project"].aggregate(pipeline).to_list(length=None)
+    else:
+        docs = await db["project"].find(q, projection).sort(sort).limit(limit).to_list(length=None)
+    cursor = next_cursor(docs, sort, limit)
+    return APIResponse([serialize_doc(d) for d in docs], headers=cursor_headers(cursor))
 
 class ProjectCreateIn(BaseModel):
     title: str
@@ -173,59 +325,121 @@ class ProjectCreateIn(BaseModel):
     request_id: Optional[str] = None
 
 @app.post("/api/projects", status_code=201)
-def create_project(payload: ProjectCreateIn):
+async def create_project(payload: ProjectCreateIn):
     project = payload.dict()
     project.update({
         "status": "in_progress",
         "drafts": [],
         "comments": [],
         "history": [],
+        "draft_count": 0,
+        "comment_count": 0,
+        "open_comment_count": 0,
     })
-    pid = create_document("project", project)
-    saved = db["project"].find_one({"_id": ObjectId(pid)})
-    return serialize_doc(saved)
+    saved = await create_document_async("project", project)
+    await record_created(db, "project")
+    return APIResponse(serialize_doc(saved), status_code=201)
 
 @app.post("/api/projects/{project_id}/upload-draft")
-def upload_draft(project_id: str, url: str):
+async def upload_draft(project_id: str, url: str):
     now = datetime.now(timezone.utc)
-    res = db["project"].update_one({"_id": ObjectId(project_id)}, {"$push": {"drafts": {"url": url, "uploaded_at": now}}, "$set": {"updated_at": now}})
-    if res.matched_count == 0:
+    doc = await append_item(db, project_oid(project_id), "draft", {"url": url, "uploaded_at": now}, {"updated_at": now})
+    if doc is None:
         raise HTTPException(status_code=404, detail="Project not found")
-    doc = db["project"].find_one({"_id": ObjectId(project_id)})
-    return serialize_doc(doc)
+    return APIResponse(serialize_doc(doc))
 
 @app.post("/api/projects/{project_id}/comment")
-def add_comment(project_id: str, payload: ProofCommentIn):
+async def add_comment(project_id: str, payload: ProofCommentIn):
     comment = payload.dict()
     comment.update({"created_at": datetime.now(timezone.utc), "status": "open"})
-    res = db["project"].update_one({"_id": ObjectId(project_id)}, {"$push": {"comments": comment}, "$set": {"updated_at": datetime.now(timezone.utc)}})
-    if res.matched_count == 0:
+    doc = await append_item(db, project_oid(project_id), "comment", comment, {"updated_at": datetime.now(timezone.utc)})
+    if doc is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return APIResponse(serialize_doc(doc))
+
+@app.get("/api/projects/{project_id}/comments")
+async def list_comments(project_id: str, after: int = Query(0, ge=0), limit: int = Query(50, ge=1, le=500)):
+    oid = project_oid(project_id)
+    if await db["project"].find_one({"_id": oid}, {"_id": 1}) is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    items, next_after = await list_items(db, oid, "comment", after, limit)
+    return APIResponse(items, headers=cursor_headers(str(next_after) if next_after else None))
+
+@app.get("/api/projects/{project_id}/drafts")
+async def list_drafts(project_id: str, after: int = Query(0, ge=0), limit: int = Query(50, ge=1, le=500)):
+    oid = project_oid(project_id)
+    if await db["project"].find_one({"_id": oid}, {"_id": 1}) is None:
         raise HTTPException(status_code=404, detail="Project not found")
-    doc = db["project"].find_one({"_id": ObjectId(project_id)})
-    return serialize_doc(doc)
+    items, next_after = await list_items(db, oid, "draft", after, limit)
+    return APIResponse(items, headers=cursor_headers(str(next_after) if next_after else None))
 
 @app.post("/api/projects/{project_id}/approve")
-def approve_project(project_id: str):
-    res = db["project"].update_one({"_id": ObjectId(project_id)}, {"$set": {"status": "approved", "approved_at": datetime.now(timezone.utc)}})
-    if res.matched_count == 0:
+async def approve_project(project_id: str):
+    doc = await db["project"].find_one_and_update({"_id": project_oid(project_id)}, {"$set": {"status": "approved", "approved_at": datetime.now(timezone.utc)}}, return_document=ReturnDocument.AFTER)
+    if doc is None:
         raise HTTPException(status_code=404, detail="Project not found")
-    doc = db["project"].find_one({"_id": ObjectId(project_id)})
-    return serialize_doc(doc)
+    return APIResponse(serialize_doc(doc))
 
 # --------- Utilities ---------
 @app.get("/api/analytics")
-def analytics():
+async def analytics():
+    cached = analytics_cache.get("analytics")
+    if cached is not None:
+        return APIResponse(cached)
+    # counters are maintained on every create, so this is two small reads
+    totals, top = await asyncio.gather(
+        read_totals(db),
+        db["product"].find({}, parse_fields(None, PRODUCT_CARD_FIELDS)).sort("rating", -1).limit(5).to_list(length=None),
+    )
     counts = {
-        "products": db["product"].count_documents({}),
-        "orders": db["order"].count_documents({}),
-        "projects": db["project"].count_documents({}),
-        "custom_requests": db["customrequest"].count_documents({}),
+        "products": totals["products"],
+        "orders": totals["orders"],
+        "projects": totals["projects"],
+        "custom_requests": totals["custom_requests"],
     }
-    top = list(db["product"].find({}).sort("rating", -1).limit(5))
-    return {"counts": counts, "top_products": [serialize_doc(d) for d in top]}
+    sales = {"revenue": totals["revenue"], "items_sold": totals["items_sold"]}
+    body = dumps({"counts": counts, "sales": sales, "top_products": [serialize_doc(d) for d in top]})
+    analytics_cache.set("analytics", body)
+    return APIResponse(body)
+
+@app.get("/api/export/{collection}")
+async def export_collection(collection: str, format: str = Query("ndjson", pattern="^(ndjson|csv)$"), since: Optional[datetime] = None, x_export_token: Optional[str] = Header(None)):
+    if collection not in EXPORTABLE_COLLECTIONS:
+        raise HTTPException(status_code=404, detail="Unknown collection")
+    if not export_allowed(collection, x_export_token):
+        raise HTTPException(status_code=403, detail="Exporting this collection requires a valid X-Export-Token")
+    q: Dict[str, Any] = {}
+    if since:
+        q["updated_at"] = {"$gte": since}
+    cursor = db[collection].find(q).batch_size(EXPORT_BATCH_SIZE)
+    if format == "csv":
+        return StreamingResponse(chunked(csv_rows(cursor)), media_type="text/csv", headers={"Content-Disposition": f'attachment; filename="{collection}.csv"'})
+    return StreamingResponse(chunked(ndjson_rows(cursor)), media_type="application/x-ndjson")
+
+@app.get("/api/cache/stats")
+async def cache_stats():
+    return {"product": product_cache.stats(), "product_lists": product_list_cache.stats(), "analytics": analytics_cache.stats()}
+
+@app.get("/api/metrics/pool")
+async def pool_stats():
+    return pool_metrics.snapshot()
+
+@app.get("/api/profiles/{profile_id}", include_in_schema=False)
+async def get_profile(profile_id: str, format: str = Query("text", pattern="^(text|pstats)$"), sort: str = Query("cumulative", pattern="^(cumulative|tottime|calls)$"), x_profile: Optional[str] = Header(None)):
+    path = profile_path(profile_id) if token_valid(x_profile) else None
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "pstats":
+        return FileResponse(path, media_type="application/octet-stream", filename=f"{profile_id}.pstats")
+    return PlainTextResponse(profile_report(path, sort))
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
 
 @app.get("/test")
-def test_database():
+async def test_database():
     response = {
         "backend": "✅ Running",
         "database": "❌ Not Available",
@@ -235,13 +449,13 @@ def test_database():
         "collections": []
     }
     try:
-        if db is not None:
+        if database_configured():
             response["database"] = "✅ Available"
             response["database_url"] = "✅ Configured"
             response["database_name"] = db.name if hasattr(db, 'name') else "✅ Connected"
             response["connection_status"] = "Connected"
             try:
-                collections = db.list_collection_names()
+                collections = await db.list_collection_names()
                 response["collections"] = collections[:10]
                 response["database"] = "✅ Connected & Working"
             except Exception as e:
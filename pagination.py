@@ -0,0 +1,65 @@
+"""
+Keyset Pagination
+
+Opaque cursor tokens built from a document's sort key values plus its `_id`.
+Pages are fetched with a range filter on those keys instead of skip(), so
+every page costs the same no matter how deep the client has scrolled.
+"""
+
+import base64
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId, json_util
+
+SortSpec = List[Tuple[str, int]]
+
+# cursor values are client input placed into the query; anything else could smuggle in operators
+CURSOR_VALUE_TYPES = (type(None), bool, int, float, str, ObjectId, datetime)
+
+class InvalidCursor(ValueError):
+    pass
+
+def keyset_sort(sort: SortSpec) -> SortSpec:
+    """Append `_id` as the tiebreaker so the sort order is total"""
+    if sort and sort[-1][0] == "_id":
+        return sort
+    return list(sort) + [("_id", sort[-1][1] if sort else 1)]
+
+def encode_cursor(doc: Dict[str, Any], sort: SortSpec) -> str:
+    values = [doc.get(field) for field, _ in keyset_sort(sort)]
+    raw = json_util.dumps(values).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(token: str, sort: SortSpec) -> List[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json_util.loads(raw)
+    except Exception:
+        raise InvalidCursor("Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(keyset_sort(sort)):
+        raise InvalidCursor("Invalid cursor")
+    if not all(isinstance(v, CURSOR_VALUE_TYPES) for v in values):
+        raise InvalidCursor("Invalid cursor")
+    return values
+
+def keyset_filter(filter_dict: Dict[str, Any], sort: SortSpec, after: Optional[str]) -> Dict[str, Any]:
+    """Restrict filter_dict to documents that sort strictly after the cursor"""
+    if not after:
+        return filter_dict
+    sort = keyset_sort(sort)
+    values = decode_cursor(after, sort)
+    branches = []
+    for i, (field, direction) in enumerate(sort):
+        branch = {f: values[j] for j, (f, _) in enumerate(sort[:i])}
+        branch[field] = {"$gt" if direction > 0 else "$lt": values[i]}
+        branches.append(branch)
+    if not filter_dict:
+        return {"$or": branches}
+    return {"$and": [filter_dict, {"$or": branches}]}
+
+def next_cursor(docs: List[Dict[str, Any]], sort: SortSpec, limit: int) -> Optional[str]:
+    """Cursor for the page after docs, or None when this was the last page"""
+    if not docs or not limit or len(docs) < limit:
+        return None
+    return encode_cursor(docs[-1], sort)
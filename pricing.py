@@ -0,0 +1,59 @@
+"""
+Checkout Pricing
+
+Server-side prices for cart items. Every product in the cart is resolved with
+a single `$in` query, so pricing costs one round trip whatever the cart size.
+"""
+
+import os
+from typing import Any, Dict, List, Tuple
+
+from bson import ObjectId
+
+# catalog price for every license unless a surcharge is configured
+LICENSE_MULTIPLIERS = {
+    "personal": 1.0,
+    "commercial": float(os.getenv("COMMERCIAL_LICENSE_MULTIPLIER", "1.0")),
+}
+# client and server totals may differ by float rounding, not by more
+PRICE_TOLERANCE = 0.005
+
+class PricingError(Exception):
+    def __init__(self, problems: List[Dict[str, Any]]):
+        super().__init__("Cart could not be priced")
+        self.problems = problems
+
+def unit_price(product: Dict[str, Any], license: str) -> float:
+    return round(product["price"] * LICENSE_MULTIPLIERS[license], 2)
+
+async def price_items(db, items: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], float]:
+    """Return items with server prices and titles plus the subtotal; raise PricingError on any mismatch"""
+    problems: List[Dict[str, Any]] = []
+    # ObjectId accepts uppercase hex; key by its canonical lowercase form
+    ids = {ObjectId(i["product_id"]) for i in items if ObjectId.is_valid(i["product_id"])}
+    cursor = db["product"].find(
+        {"_id": {"$in": list(ids)}},
+        {"price": 1, "title": 1, "in_stock": 1},
+    )
+    products = {str(p["_id"]): p async for p in cursor}
+
+    priced = []
+    subtotal = 0.0
+    for index, item in enumerate(items):
+        pid = str(ObjectId(item["product_id"])) if ObjectId.is_valid(item["product_id"]) else item["product_id"]
+        product = products.get(pid)
+        if product is None:
+            problems.append({"item": index, "product_id": item["product_id"], "error": "Product not found"})
+            continue
+        if not product.get("in_stock", True):
+            problems.append({"item": index, "product_id": item["product_id"], "error": "Product is out of stock"})
+            continue
+        price = unit_price(product, item["license"])
+        if abs(price - item["price"]) > PRICE_TOLERANCE:
+            problems.append({"item": index, "product_id": item["product_id"], "error": "Price mismatch", "expected": price})
+            continue
+        priced.append({**item, "product_id": pid, "title": product["title"], "price": price})
+        subtotal += price * item["quantity"]
+    if problems:
+        raise PricingError(problems)
+    return priced, round(subtotal, 2)
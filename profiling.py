@@ -0,0 +1,117 @@
+"""
+Request Profiling
+
+Runs individual requests under cProfile without a redeploy:
+
+- on demand, when the request carries `X-Profile: <PROFILE_TOKEN>` (a header
+  only, so the token stays out of access logs);
+- automatically for 1 in PROFILE_SAMPLE_RATE requests to each route.
+
+Each profile is written to PROFILE_DIR as `<id>.pstats` (the newest
+PROFILE_KEEP are kept), the id is returned in the `X-Profile-Id` header, and
+`GET /api/profiles/{id}` (same token) serves it as a text report or the raw
+pstats file for `python -m pstats` or snakeviz.
+
+With neither PROFILE_TOKEN nor PROFILE_SAMPLE_RATE set the middleware isn't
+installed at all. cProfile sees the event loop thread, so a profile includes
+whatever other requests ran concurrently; one profile runs at a time and
+requests arriving meanwhile are served unprofiled. Profiles are written and
+pruned on a worker thread, off the event loop.
+"""
+
+import asyncio
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import re
+import tempfile
+import uuid
+from collections import defaultdict
+from typing import Optional
+
+from starlette.datastructures import MutableHeaders
+
+from metrics import route_template
+
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_SAMPLE_RATE = int(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "profiles"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "100"))
+
+_PROFILE_ID = re.compile(r"^[0-9a-f]{32}$")
+# fetching a profile sends the token too; don't profile that
+_PROFILES_PATH = "/api/profiles/"
+
+def profiling_enabled() -> bool:
+    return bool(PROFILE_TOKEN) or PROFILE_SAMPLE_RATE > 0
+
+def token_valid(token: Optional[str]) -> bool:
+    return bool(PROFILE_TOKEN) and token is not None and hmac.compare_digest(token, PROFILE_TOKEN)
+
+def profile_path(profile_id: str) -> Optional[str]:
+    """Path of a stored profile, or None for malformed or unknown ids"""
+    if not _PROFILE_ID.match(profile_id):
+        return None
+    path = os.path.join(PROFILE_DIR, f"{profile_id}.pstats")
+    return path if os.path.exists(path) else None
+
+def profile_report(path: str, sort: str = "cumulative", limit: int = 50) -> str:
+    out = io.StringIO()
+    pstats.Stats(path, stream=out).strip_dirs().sort_stats(sort).print_stats(limit)
+    return out.getvalue()
+
+def _save(profiler: cProfile.Profile, profile_id: str):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    profiler.dump_stats(os.path.join(PROFILE_DIR, f"{profile_id}.pstats"))
+    stored = sorted(
+        (e for e in os.scandir(PROFILE_DIR) if e.name.endswith(".pstats")),
+        key=lambda e: e.stat().st_mtime,
+    )
+    for entry in stored[:-PROFILE_KEEP]:
+        os.remove(entry.path)
+
+class ProfilingMiddleware:
+    def __init__(self, app, fastapi_app):
+        self.app = app
+        self.fastapi_app = fastapi_app
+        self.seen = defaultdict(int)
+        self.active = False
+
+    def _requested(self, scope) -> bool:
+        if not PROFILE_TOKEN:
+            return False
+        for name, value in scope["headers"]:
+            if name == b"x-profile":
+                return token_valid(value.decode("latin-1"))
+        return False
+
+    def _sampled(self, scope) -> bool:
+        if PROFILE_SAMPLE_RATE <= 0:
+            return False
+        route = route_template(self.fastapi_app, scope)
+        self.seen[route] += 1
+        return self.seen[route] % PROFILE_SAMPLE_RATE == 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.active or scope["path"].startswith(_PROFILES_PATH) or not (self._requested(scope) or self._sampled(scope)):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("X-Profile-Id", profile_id)
+            await send(message)
+
+        self.active = True
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.disable()
+            self.active = False
+            await asyncio.to_thread(_save, profiler, profile_id)
@@ -0,0 +1,39 @@
+"""
+JSON Responses
+
+orjson-backed response class used by every route. BSON types that orjson
+doesn't know natively (ObjectId, Decimal128) are handled in `_default` at any
+nesting depth; datetimes, including the ones inside project drafts and
+comments, are encoded natively in the same ISO 8601 form
+`datetime.isoformat()` produces.
+
+Routes return `APIResponse` instances directly so FastAPI skips its
+`jsonable_encoder` pass and the payload is walked exactly once, inside orjson.
+Payloads that are already encoded (cached bytes) are sent as-is.
+"""
+
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from bson import Decimal128, ObjectId
+from fastapi.responses import ORJSONResponse
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    # decimals go out as strings so money values keep their exact precision
+    if isinstance(obj, Decimal128):
+        return str(obj.to_decimal())
+    if isinstance(obj, Decimal):
+        return str(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+class APIResponse(ORJSONResponse):
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
@@ -0,0 +1,12 @@
+"""
+Settings
+
+Loads `.env` into the environment. Modules that read their configuration when
+imported import this first, so the command-line scripts (`python buckets.py
+--migrate`, `python indexes.py --apply`, ...) see the same values as the
+server.
+"""
+
+from dotenv import load_dotenv
+
+load_dotenv()